@@ -14,18 +14,57 @@ Author: Writer's Assistant Team
 """
 
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from flask_compress import Compress
+from html import escape
 import os
+import sys
+import uuid
+import hashlib
 from datetime import datetime
-import json
+import orjson
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from operator import itemgetter
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider backed by orjson
+    
+    Used by jsonify() and request.json, so every endpoint encodes and decodes
+    JSON through orjson instead of the standard library json module.
+    """
+    mimetype = 'application/json'
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Hand the encoded bytes straight to the response (no str round trip)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype=self.mimetype)
 
 # Initialize Flask application
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Enable CORS (Cross-Origin Resource Sharing) to allow frontend communication
 # This allows the frontend to make API requests from different origins
 CORS(app)
 
+# Compress JSON/text responses (Brotli preferred, gzip fallback); responses
+# smaller than 1 KB are sent as-is since compression would not pay off
+app.config['COMPRESS_MIMETYPES'] = ['application/json', 'text/html', 'text/plain']
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_BR_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 1024
+Compress(app)
+
 # ============================================
 # Configuration & Setup
 # ============================================
@@ -33,12 +72,225 @@ CORS(app)
 # Data directory for storing saved documents
 # Creates the directory if it doesn't exist
 DATA_DIR = 'data'
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# Fields kept in the document metadata cache (everything except content)
+META_FIELDS = ('id', 'title', 'created_at', 'updated_at')
+
+# In-memory metadata cache (doc_id -> metadata) used to serve list requests
+# without re-reading every document file from disk. Entries are revalidated
+# against each file's modification time (doc_id -> mtime_ns), so files written
+# by other worker processes are picked up too. Unreadable files only get an
+# mtime entry, so they are skipped without being re-read on every request
+_meta_cache = {}
+_meta_mtimes = {}
+
+# Encoded /api/list-documents response body, reused until the metadata
+# cache changes (None when it has to be rebuilt)
+_list_body = None
+
+# Guards the metadata cache and the encoded list body, which are updated by
+# concurrent requests under threaded servers
+_meta_lock = threading.Lock()
+
+# Maximum number of threads used to read changed files in parallel
+META_READ_WORKERS = 16
+
+def _read_meta(file_path):
+    """
+    Read a document file and return only its metadata fields
+    
+    Returns:
+        dict: Document metadata, or None if the file cannot be read or does
+              not contain a JSON object (e.g. truncated by a crashed write)
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            doc = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    if not isinstance(doc, dict):
+        return None
+    return {k: doc.get(k) for k in META_FIELDS}
+
+def _read_metas(paths):
+    """
+    Read the metadata of several files, overlapping the reads on OS threads
+    
+    Under the gevent worker, threading is monkey-patched into greenlets that
+    do not yield on file I/O, so the reads go to gevent's hub threadpool
+    (real OS threads) instead, and the calling greenlet yields while waiting.
+    
+    Args:
+        paths (list): Paths of the document files to read
+    
+    Returns:
+        list: Metadata (or None) for each path, in the same order
+    """
+    if len(paths) <= 1:
+        return [_read_meta(file_path) for file_path in paths]
+    
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    if gevent_monkey is not None and gevent_monkey.is_module_patched('threading'):
+        from gevent import get_hub
+        return list(get_hub().threadpool.map(_read_meta, paths))
+    
+    with ThreadPoolExecutor(max_workers=min(META_READ_WORKERS, len(paths))) as pool:
+        return list(pool.map(_read_meta, paths))
+
+def _refresh_meta_cache():
+    """
+    Revalidate the metadata cache with a single os.scandir pass
+    
+    Only files that are new or whose modification time changed are opened
+    (in parallel when there are several, e.g. on the cold startup scan);
+    unreadable files are left out of the listing, and entries for files that
+    no longer exist are dropped.
+    
+    Returns:
+        str: ETag for the listing, a hash of every (doc_id, mtime_ns) pair,
+             so any added, changed or removed file changes it
+    """
+    with _meta_lock:
+        seen = set()
+        stale = []  # (doc_id, mtime_ns, file_path) of files that need reading
+        with os.scandir(DATA_DIR) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                doc_id = entry.name[:-len('.json')]
+                try:
+                    mtime_ns = entry.stat().st_mtime_ns
+                except FileNotFoundError:
+                    # Removed since the directory was listed
+                    continue
+                seen.add(doc_id)
+                if _meta_mtimes.get(doc_id) != mtime_ns:
+                    stale.append((doc_id, mtime_ns, entry.path))
+        
+        metas = _read_metas([file_path for _, _, file_path in stale])
+        
+        for (doc_id, mtime_ns, _), meta in zip(stale, metas):
+            if meta is None:
+                _meta_cache.pop(doc_id, None)
+            else:
+                _meta_cache[doc_id] = meta
+            _meta_mtimes[doc_id] = mtime_ns
+        
+        removed = _meta_mtimes.keys() - seen
+        for doc_id in removed:
+            _meta_cache.pop(doc_id, None)
+            del _meta_mtimes[doc_id]
+        
+        if stale or removed:
+            _invalidate_list_body()
+        
+        # _meta_mtimes now holds exactly the (doc_id, mtime_ns) pairs seen
+        listing = orjson.dumps(sorted(_meta_mtimes.items()))
+        return hashlib.blake2b(listing, digest_size=16).hexdigest()
+
+def _invalidate_list_body():
+    """
+    Discard the encoded document list after the metadata cache changed
+    (callers hold _meta_lock)
+    """
+    global _list_body
+    _list_body = None
+
+# Warm the metadata cache at startup
+_refresh_meta_cache()
+
+# Bounded LRU cache of raw document files (doc_id -> (mtime_ns, JSON bytes))
+# Entries are only served while the file's modification time is unchanged
+DOC_CACHE_SIZE = 128
+_doc_cache = OrderedDict()
+_doc_cache_lock = threading.Lock()
 
-# In-memory storage for documents
-# Note: In production, replace this with a proper database (SQLite, PostgreSQL, etc.)
-documents = {}
+def _read_document(doc_id, file_path, mtime_ns):
+    """
+    Read a document file's raw JSON bytes, reusing the cached copy when unchanged
+    
+    Args:
+        doc_id (str): Document ID
+        file_path (str): Path to the document's JSON file
+        mtime_ns (int): Current modification time of the file
+    
+    Returns:
+        bytes: Encoded document JSON, exactly as stored on disk, or None if
+               the file does not hold a JSON object (e.g. truncated)
+    """
+    with _doc_cache_lock:
+        cached = _doc_cache.get(doc_id)
+        if cached is not None and cached[0] == mtime_ns:
+            _doc_cache.move_to_end(doc_id)
+            return cached[1]
+    
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    
+    # The bytes are served without re-encoding, so validate them once here
+    # (only on a cache miss) rather than sending invalid JSON to the client
+    try:
+        doc = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(doc, dict):
+        return None
+    
+    _cache_document(doc_id, mtime_ns, raw)
+    return raw
+
+def _cache_document(doc_id, mtime_ns, raw):
+    """
+    Insert a document into the LRU cache, evicting the least recently used entry
+    """
+    with _doc_cache_lock:
+        _doc_cache[doc_id] = (mtime_ns, raw)
+        _doc_cache.move_to_end(doc_id)
+        if len(_doc_cache) > DOC_CACHE_SIZE:
+            _doc_cache.popitem(last=False)
+
+def _document_etag(st):
+    """
+    Build a document's ETag from its file stat information
+    
+    Args:
+        st (os.stat_result): Stat result of the document's JSON file
+    
+    Returns:
+        str: ETag built from the modification time (ns) and file size
+    """
+    return f'{st.st_mtime_ns:x}-{st.st_size:x}'
+
+def _with_etag(response, etag):
+    """
+    Attach an ETag header to a response
+    """
+    response.set_etag(etag)
+    return response
+
+def _not_modified(etag):
+    """
+    Return a 304 response if the client's cached copy is still current
+    (If-None-Match matches the ETag), otherwise None
+    
+    If-Modified-Since is not honoured: HTTP dates only have whole-second
+    precision, so a document overwritten within the same second would be
+    reported as unchanged.
+    """
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return None
+    # If-None-Match uses weak comparison, so weak tags (e.g. from a proxy
+    # that compressed the response) count too. Flask-Compress appends
+    # ':<algorithm>' to the ETag of compressed responses, so compare only the
+    # part before the suffix
+    if not (if_none_match.star_tag or any(
+        tag.partition(':')[0] == etag
+        for tag in if_none_match.as_set(include_weak=True)
+    )):
+        return None
+    return _with_etag(app.response_class(status=304), etag)
 
 # ============================================
 # API Routes
@@ -162,8 +414,12 @@ def save_document():
         JSON response with saved document data
     """
     data = request.json
+    # Read the clock once and reuse it for the default ID and both timestamps
+    now = datetime.now()
+    timestamp = now.isoformat()  # ISO format timestamp
+    
     # Generate document ID from timestamp if not provided
-    doc_id = data.get('id', datetime.now().strftime('%Y%m%d%H%M%S'))
+    doc_id = data.get('id', now.strftime('%Y%m%d%H%M%S'))
     content = data.get('content', '')
     title = data.get('title', 'Untitled Document')
     
@@ -172,17 +428,37 @@ def save_document():
         'id': doc_id,
         'title': title,
         'content': content,
-        'created_at': datetime.now().isoformat(),  # ISO format timestamp
-        'updated_at': datetime.now().isoformat()
+        'created_at': timestamp,
+        'updated_at': timestamp
     }
     
-    # Store in memory (for quick access)
-    documents[doc_id] = document
-    
     # Save to file system for persistence
+    # Write to a temporary file and atomically replace the document, so a
+    # crash mid-write never leaves a truncated file and readers (including
+    # other workers) only ever see a complete document
     file_path = os.path.join(DATA_DIR, f'{doc_id}.json')
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(document, f, indent=2)  # Pretty print JSON
+    tmp_path = f'{file_path}.{uuid.uuid4().hex}.tmp'
+    raw = orjson.dumps(document)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            # Take the mtime from our own file before it is renamed into
+            # place (rename keeps it); a stat after the replace could see a
+            # newer version written by another worker
+            mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+        os.replace(tmp_path, file_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    # Keep the metadata and document caches in sync with the file system
+    with _meta_lock:
+        _meta_cache[doc_id] = {k: document[k] for k in META_FIELDS}
+        _meta_mtimes[doc_id] = mtime_ns
+        _invalidate_list_body()
+    _cache_document(doc_id, mtime_ns, raw)
     
     return jsonify({
         'success': True,
@@ -198,24 +474,41 @@ def load_document(doc_id):
         - doc_id (str): Document ID to load
     
     Returns:
-        JSON response with document data, or 404 if not found
+        JSON response with document data, 304 if the client's copy is
+        current, 404 if not found, or 500 if the stored file is corrupted
     """
     file_path = os.path.join(DATA_DIR, f'{doc_id}.json')
     
-    # Check if file exists
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            document = json.load(f)
+    # Check if file exists (the stat also validates the cached copy)
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        # Return 404 if document not found
         return jsonify({
-            'success': True,
-            'document': document
-        })
-    
-    # Return 404 if document not found
-    return jsonify({
-        'success': False,
-        'error': 'Document not found'
-    }), 404
+            'success': False,
+            'error': 'Document not found'
+        }), 404
+    
+    # Skip reading the file entirely if the client already has this version
+    etag = _document_etag(st)
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    
+    # The stored file is already the document's JSON, so splice its bytes
+    # into the response envelope instead of decoding and re-encoding them
+    raw = _read_document(doc_id, file_path, st.st_mtime_ns)
+    if raw is None:
+        return jsonify({
+            'success': False,
+            'error': 'Document is corrupted'
+        }), 500
+    
+    response = app.response_class(
+        b'{"success":true,"document":' + raw + b'}',
+        mimetype='application/json'
+    )
+    return _with_etag(response, etag)
 
 @app.route('/api/list-documents', methods=['GET'])
 def list_documents():
@@ -223,31 +516,34 @@ def list_documents():
     List all saved documents with metadata
     
     Returns:
-        JSON response with list of documents (sorted by most recent first)
-    """
-    doc_list = []
-    
-    # Iterate through all JSON files in data directory
-    for filename in os.listdir(DATA_DIR):
-        if filename.endswith('.json'):
-            file_path = os.path.join(DATA_DIR, filename)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                doc = json.load(f)
-                # Add only metadata (not full content) to list
-                doc_list.append({
-                    'id': doc.get('id'),
-                    'title': doc.get('title'),
-                    'created_at': doc.get('created_at'),
-                    'updated_at': doc.get('updated_at')
-                })
-    
-    # Sort by updated_at in descending order (most recent first)
-    doc_list.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
+        JSON response with list of documents (sorted by most recent first),
+        or 304 if the client's copy is current
+    """
+    # Revalidate the cache and get the listing's ETag (unchanged files are
+    # not opened). No Last-Modified is used: deleting a document does not
+    # make any remaining file newer
+    etag = _refresh_meta_cache()
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    
+    # Encode the list once and reuse the bytes until a document changes
+    global _list_body
+    with _meta_lock:
+        if _list_body is None:
+            # Serve metadata (not full content) from the in-memory cache, sorted
+            # by updated_at in descending order (most recent first); cache
+            # entries always carry every META_FIELDS key
+            doc_list = sorted(_meta_cache.values(), key=itemgetter('updated_at'), reverse=True)
+            
+            _list_body = orjson.dumps({
+                'success': True,
+                'documents': doc_list
+            })
+        body = _list_body
     
-    return jsonify({
-        'success': True,
-        'documents': doc_list
-    })
+    response = app.response_class(body, mimetype='application/json')
+    return _with_etag(response, etag)
 
 @app.route('/api/export-document', methods=['POST'])
 def export_document():
@@ -265,40 +561,46 @@ def export_document():
     content = data.get('content', '')
     format_type = data.get('format', 'txt')  # Default to plain text
     
-    # Handle different export formats
-    if format_type == 'txt':
-        # Plain text export
-        return jsonify({
-            'success': True,
-            'format': 'txt',
-            'content': content
-        })
-    elif format_type == 'html':
-        # HTML export with basic structure
-        html_content = f"<html><head><title>Exported Document</title></head><body><pre>{content}</pre></body></html>"
-        return jsonify({
-            'success': True,
-            'format': 'html',
-            'content': html_content
-        })
-    elif format_type == 'markdown':
-        # Markdown export (as-is, assuming content is already markdown)
+    # Look up the exporter for the requested format
+    exporter = EXPORTERS.get(format_type) if isinstance(format_type, str) else None
+    if exporter is None:
+        # Return error for unsupported formats
         return jsonify({
-            'success': True,
-            'format': 'markdown',
-            'content': content
-        })
+            'success': False,
+            'error': 'Unsupported format'
+        }), 400
     
-    # Return error for unsupported formats
     return jsonify({
-        'success': False,
-        'error': 'Unsupported format'
-    }), 400
+        'success': True,
+        'format': format_type,
+        'content': exporter(content)
+    })
 
 # ============================================
 # Helper Functions: AI/Processing Logic
 # ============================================
 
+# Note: When these helpers are wired up to external AI/grammar services, send
+# all outbound HTTP calls through one module-level requests.Session (with an
+# HTTPAdapter connection pool and Retry policy) instead of calling
+# requests.post() per request, so connections are kept alive and reused
+
+# Canned chat responses in priority order, each with its trigger keywords
+CHAT_RESPONSES = (
+    (('grammar', 'spell'), "I can help you check grammar and spelling! Try using the 'Check Grammar' button or paste your text here."),
+    (('style', 'improve'), "I can help improve your writing style! Use the 'Improve Style' button for suggestions."),
+    (('idea', 'suggest'), "I can help generate writing ideas! Use the 'Generate Ideas' button or tell me what you're writing about."),
+    (('hello', 'hi'), "Hello! I'm Rubricy, your writing assistant. How can I help you with your writing today?"),
+    (('help',), "I can help you with:\n• Grammar and spelling checks\n• Writing style improvements\n• Generating ideas\n• Organizing your thoughts\n\nWhat would you like help with?"),
+)
+
+# (keyword, response) pairs flattened in the same priority order
+_CHAT_KEYWORDS = tuple(
+    (keyword, reply)
+    for keywords, reply in CHAT_RESPONSES
+    for keyword in keywords
+)
+
 def generate_chat_response(message, context):
     """
     Generate a response to user's chat message
@@ -316,18 +618,11 @@ def generate_chat_response(message, context):
     message_lower = message.lower()
     
     # Keyword-based response logic (replace with actual AI in production)
-    if 'grammar' in message_lower or 'spell' in message_lower:
-        return "I can help you check grammar and spelling! Try using the 'Check Grammar' button or paste your text here."
-    elif 'style' in message_lower or 'improve' in message_lower:
-        return "I can help improve your writing style! Use the 'Improve Style' button for suggestions."
-    elif 'idea' in message_lower or 'suggest' in message_lower:
-        return "I can help generate writing ideas! Use the 'Generate Ideas' button or tell me what you're writing about."
-    elif 'hello' in message_lower or 'hi' in message_lower:
-        return "Hello! I'm Rubricy, your writing assistant. How can I help you with your writing today?"
-    elif 'help' in message_lower:
-        return "I can help you with:\n• Grammar and spelling checks\n• Writing style improvements\n• Generating ideas\n• Organizing your thoughts\n\nWhat would you like help with?"
-    else:
-        return f"I understand you're asking about '{message}'. I'm here to help with your writing! Try asking about grammar, style, or ideas for your piece."
+    # The first keyword (in priority order) found in the message wins
+    for keyword, reply in _CHAT_KEYWORDS:
+        if keyword in message_lower:
+            return reply
+    return f"I understand you're asking about '{message}'. I'm here to help with your writing! Try asking about grammar, style, or ideas for your piece."
 
 def check_grammar_issues(text):
     """
@@ -348,12 +643,14 @@ def check_grammar_issues(text):
     
     # Basic grammar checks (expand in production)
     if len(text) > 0:
-        # Check for double spaces (formatting issue)
-        if '  ' in text:
+        # Check for double spaces (formatting issue); a single find gives
+        # both the presence check and the position
+        position = text.find('  ')
+        if position >= 0:
             issues.append({
                 'type': 'formatting',
                 'message': 'Double spaces detected',
-                'position': text.find('  ')
+                'position': position
             })
     
     return issues
@@ -387,15 +684,15 @@ def generate_style_suggestions(text):
     suggestions = []
     
     if len(text) > 0:
-        # Check for overly long sentences
-        sentences = text.split('.')
-        long_sentences = [s for s in sentences if len(s) > 100]
-        if long_sentences:
+        # Check for overly long sentences (stops at the first long one)
+        if any(len(s) > 100 for s in text.split('.')):
             suggestions.append("Consider breaking up long sentences for better readability.")
         
-        # Check for overly long paragraphs
-        paragraphs = text.split('\n\n')
-        if len(paragraphs) > 0 and len(paragraphs[0]) > 500:
+        # Check for overly long paragraphs (only the first paragraph is
+        # measured, so locate its end instead of splitting the whole text)
+        first_break = text.find('\n\n')
+        first_paragraph_len = len(text) if first_break < 0 else first_break
+        if first_paragraph_len > 500:
             suggestions.append("Consider splitting long paragraphs into shorter ones.")
     
     return suggestions
@@ -413,6 +710,9 @@ def apply_style_improvements(text, suggestions):
     
     Note: This is a placeholder. In production, implement actual text
           transformation using NLP libraries like spaCy or NLTK.
+          Load the spaCy model once at module import with unused pipeline
+          components disabled, and process paragraphs in batches with
+          nlp.pipe() rather than calling nlp() per sentence.
     """
     # Placeholder implementation - in production, use sophisticated NLP
     return text
@@ -444,6 +744,42 @@ def generate_writing_ideas(context, topic):
     
     return ideas
 
+# ============================================
+# Helper Functions: Document Export
+# ============================================
+
+def export_txt(content):
+    """
+    Export content as plain text (returned as-is)
+    """
+    return content
+
+def export_html(content):
+    """
+    Export content as an HTML page
+    
+    Args:
+        content (str): Document content to export
+    
+    Returns:
+        str: HTML document with the content in a <pre> block (content is
+             escaped so it is shown as text rather than interpreted as markup)
+    """
+    return f"<html><head><title>Exported Document</title></head><body><pre>{escape(str(content))}</pre></body></html>"
+
+def export_markdown(content):
+    """
+    Export content as Markdown (as-is, assuming content is already markdown)
+    """
+    return content
+
+# Export format -> exporter function used by /api/export-document
+EXPORTERS = {
+    'txt': export_txt,
+    'html': export_html,
+    'markdown': export_markdown,
+}
+
 # ============================================
 # Application Entry Point
 # ============================================
@@ -453,7 +789,7 @@ if __name__ == '__main__':
     Run the Flask development server
     
     Starts the server on localhost:5000 with debug mode enabled.
-    In production, use a proper WSGI server like Gunicorn or uWSGI.
+    In production, run wsgi.py under Gunicorn with gevent workers instead.
     """
     print("Starting Writer's Assistant Backend...")
     print("Server running at http://localhost:5000")
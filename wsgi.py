@@ -0,0 +1,14 @@
+"""
+Writer's Assistant - WSGI Entry Point
+
+Production entry point for running the backend under Gunicorn with gevent
+workers, so I/O-bound requests are served concurrently instead of one at a
+time as with the Flask development server:
+
+    gunicorn -k gevent -w $(nproc) --worker-connections 1000 wsgi:app
+"""
+
+from app import app
+
+if __name__ == '__main__':
+    app.run(port=5000)